@@ -117,11 +117,12 @@ def get_tweets(SEARCH, sinceId, max_id=None):
     logger.info("Downloaded {0} tweets".format(tweetCount))
     return tweets
 
-def write_file(searchterm, resultsjson, date=None):
+def write_file(searchterm, resultsjson, date=None, mode="w"):
+    # mode "a" appends, for writers that archive in several batches
 
     filename = JSON_FILEPATH + "tweets_" + searchterm + "_" + date + ".json"
     ensure_file_exists(filename)
-    with open(filename, "w", encoding="utf8", errors="ignore") as handle:
+    with open(filename, mode, encoding="utf8", errors="ignore") as handle:
         for res in resultsjson:
             handle.write(json.dumps(res) + "\n")
     return filename
@@ -0,0 +1,172 @@
+# usage: python hydrate_tweets.py <idfile | replies | media> [searchterm]
+# Fetches full tweets for a list of tweet ids using statuses_lookup.
+# <idfile> is a text file with one tweet id per line. "replies" uses the
+# reply_to_tweet ids and "media" the source_status_id ids already in the db.
+# Ids already in the Tweet table are skipped. The searchterm (default
+# "hydrate") is used for the archive filename and the Tweet.searchterm column.
+# Ids the api does not return (deleted or protected) go in a checkpoint file
+# and are skipped on a rerun; returned ids that failed to save are fetched
+# again, so the day's archive can hold duplicate lines after a resume.
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import logging
+import os
+import sys
+
+import tweepy
+
+import collect_tweets as collect
+from database import Media, Tweet
+
+BATCH_SIZE = 100  # statuses_lookup maximum per call
+CHECK_SIZE = 1000  # ids per "already in db" query
+
+TODAY = date.today().strftime("%Y-%m-%d")
+
+
+def get_ids_from_file(filename):
+    # one id per line, blank lines and junk skipped; keeps file order
+    ids = []
+    with open(filename) as handle:
+        for line in handle:
+            line = line.strip()
+            if line.isdecimal():
+                ids.append(int(line))
+            elif line:
+                logger.warning("Skipping bad id line %s", line)
+    return ids
+
+
+def get_ids_from_db(source):
+    # ids the db references but never fetched
+    known = Tweet.select(Tweet.id)
+    if source == "replies":
+        query = (Tweet.select(Tweet.reply_to_tweet)
+                 .where(Tweet.reply_to_tweet.is_null(False) &
+                        Tweet.reply_to_tweet.not_in(known))
+                 .distinct())
+        return [row.reply_to_tweet for row in query]
+    if source == "media":
+        query = (Media.select(Media.source_status_id)
+                 .where(Media.source_status_id.is_null(False) &
+                        Media.source_status_id.not_in(known))
+                 .distinct())
+        return [row.source_status_id for row in query]
+    return []
+
+
+def remove_known_ids(ids, missing=None):
+    # drop dupes, ids in the missing (checkpoint) set, and ids already in Tweet
+    missing = missing or set()
+    seen = set()
+    unique = []
+    for id in ids:
+        if id not in seen and id not in missing:
+            seen.add(id)
+            unique.append(id)
+    known = set()
+    for i in range(0, len(unique), CHECK_SIZE):
+        chunk = unique[i:i + CHECK_SIZE]
+        known.update(t.id for t in Tweet.select(Tweet.id).where(Tweet.id.in_(chunk)))
+    return [id for id in unique if id not in known]
+
+
+def checkpoint_filename(searchterm):
+    return collect.LOGGERPATH + "hydrate_" + searchterm + ".missing"
+
+
+def read_checkpoint(filename):
+    # ids an earlier run asked for but the api did not return, so a restart
+    # does not re-request deleted or protected tweets that will never reach the db
+    if not os.path.exists(filename):
+        return set()
+    with open(filename) as handle:
+        return set(int(line) for line in handle if line.strip().isdecimal())
+
+
+def write_checkpoint(filename, missing):
+    with open(filename, "a") as handle:
+        for id in missing:
+            handle.write("%s\n" % id)
+
+
+def lookup_batch(batch):
+    # api is built with wait_on_rate_limit, so tweepy sleeps out a 429 itself
+    try:
+        return [status._json for status in collect.api.statuses_lookup(batch)]
+    except tweepy.TweepError as e:
+        logger.error("Lookup error for batch starting %s: %s" % (batch[0], e))
+        return None
+
+
+def hydrate(ids, searchterm, checkpoint):
+    # Fetch in BATCH_SIZE lookups. The next batch is requested while the
+    # current one is archived and loaded, so the db work hides the api latency.
+    batches = [ids[i:i + BATCH_SIZE] for i in range(0, len(ids), BATCH_SIZE)]
+    foundcount = 0
+    savedcount = 0
+    if not batches:
+        return foundcount, savedcount
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(lookup_batch, batches[0])
+        for i, batch in enumerate(batches):
+            results = pending.result()
+            if i + 1 < len(batches):
+                pending = pool.submit(lookup_batch, batches[i + 1])
+            if results is None:
+                # not checkpointed, so the next run retries this batch
+                continue
+            # only ids the api did not return; anything returned but not saved
+            # is left to the Tweet check, so a rerun fetches it again
+            missing = set(batch) - set(r["id"] for r in results)
+            write_checkpoint(checkpoint, missing)
+            if results:
+                fileout = collect.write_file(searchterm, results, date=TODAY, mode="a")
+                logger.info("Appended to file %s" % fileout)
+                saved = collect.add_to_database(results, searchterm)
+                foundcount += len(results)
+                savedcount += saved
+            print("batch %s of %s: found %s tweets" % (i + 1, len(batches), len(results)))
+            logger.info("Batch %s: requested %s, found %s" % (i + 1, len(batch), len(results)))
+    return foundcount, savedcount
+
+
+def main():
+    global logger
+    logger = logging.getLogger('hydrate_tweets')
+    formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
+    logger.setLevel(logging.INFO)
+    collect.logger = logger  # add_to_database logs to the collect module global
+
+    if len(sys.argv) < 2:
+        print("Usage: python hydrate_tweets.py <idfile | replies | media> [searchterm]")
+        return
+    SOURCE = sys.argv[1]
+    SEARCHTERM = sys.argv[2] if len(sys.argv) > 2 else "hydrate"
+
+    logfile = collect.LOGGERPATH + 'hydrate_' + SEARCHTERM + '.log'
+    collect.ensure_file_exists(logfile)
+    hdlr = logging.FileHandler(logfile)
+    hdlr.setFormatter(formatter)
+    logger.addHandler(hdlr)
+
+    if SOURCE in ("replies", "media"):
+        ids = get_ids_from_db(SOURCE)
+    else:
+        ids = get_ids_from_file(SOURCE)
+
+    checkpoint = checkpoint_filename(SEARCHTERM)
+    ids = remove_known_ids(ids, missing=read_checkpoint(checkpoint))
+    logger.info("Hydrating %s ids from %s" % (len(ids), SOURCE))
+
+    foundcount, savedcount = hydrate(ids, SEARCHTERM, checkpoint)
+    logger.info("Found %s of %s tweets, added %s to the db" % (foundcount, len(ids), savedcount))
+    if foundcount != savedcount:
+        diff = foundcount - savedcount
+        logger.warning("Mismatch of %s in Found vs Saved for %s" % (diff, SEARCHTERM))
+    logger.removeHandler(hdlr)
+
+if __name__ == "__main__":
+    main()